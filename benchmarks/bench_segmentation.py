@@ -0,0 +1,228 @@
+# bench_segmentation.py
+""" mySegmentation 레이블러와 TailsMura 지수 계산 벤치마크
+
+    합성 마스크(seed 고정)를 해상도/결함밀도별로 만들어 각 레이블러와
+    get_tailsmura_index(method x final) 조합의 실행시간, 최대 임시메모리를 측정한다.
+    기준(baseline) JSON과 비교해서 허용치를 넘거나, 기준 파일이 없거나, 비교할 항목이 없으면
+    종료코드 1로 실패한다(기준은 측정 환경마다 --save-baseline 으로 먼저 저장).
+
+    사용 예:
+        python benchmarks/bench_segmentation.py --sizes 256 1024 --save-baseline
+        python benchmarks/bench_segmentation.py --sizes 256 1024
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mylibs.mySegmentation import (  # noqa: E402
+    Segmentation,
+    SegmentationWithDiagonal,
+    SegmentationWithDiagonal_recursion,
+    largest_component_area,
+    label_connected_pixels,
+    label_runs,
+)
+from mylibs.myTailsMura import TailsMura_Thickness, TailsMura_Wavelength  # noqa: E402
+
+
+DEFAULT_SIZES = (256, 1024, 2048, 4096, 8192)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+PATTERNS = ("noise", "blobs", "lines", "checker")
+METHODS = ("percent", "jnd", "both")
+FINALS = ("sum", "max", "avg")
+
+
+def make_mask(pattern: str, size: int, density: float=0.3, seed: int=0) -> np.ndarray:
+    """ 합성 마스크 생성
+
+    Args:
+        pattern (str): 패턴 종류["noise", "blobs", "lines", "checker"]
+        size (int): 이미지 크기(size x size)
+        density (float): 전경 비율(noise, blobs) 또는 선 간격 기준
+        seed (int): 난수 seed
+    Returns:
+        mask (ndarray): bool 마스크
+    """
+    rng = np.random.default_rng(seed)
+    if pattern == "noise":  # 독립 픽셀 잡음(작은 연결요소가 매우 많음)
+        return rng.random((size, size)) < density
+    if pattern == "blobs":  # 저해상도 잡음을 키워서 큰 덩어리 생성
+        cell = max(1, size // 32)
+        coarse = rng.random((size // cell + 1, size // cell + 1))
+        field = np.kron(coarse, np.ones((cell, cell)))[:size, :size]
+        field += 0.3 * rng.random((size, size))
+        return field > np.quantile(field, 1 - density)
+    if pattern == "lines":  # 1픽셀 두께 대각선(대각 연결에서만 이어짐)
+        rows, cols = np.indices((size, size))
+        spacing = max(2, int(1 / max(density, 1e-3)))
+        return (rows + cols) % spacing == 0
+    if pattern == "checker":  # 체커보드(4연결 최악의 경우)
+        rows, cols = np.indices((size, size))
+        return (rows + cols) % 2 == 0
+    raise ValueError(f"unknown pattern: {pattern}")
+
+
+def make_wavelength_map(size: int, seed: int=0) -> np.ndarray:
+    """ 중앙값 550nm 부근의 합성 파장맵(완만한 얼룩 + 잡음)
+    """
+    rng = np.random.default_rng(seed)
+    cell = max(1, size // 16)
+    coarse = rng.normal(0, 1.5, (size // cell + 1, size // cell + 1))
+    field = np.kron(coarse, np.ones((cell, cell)))[:size, :size]
+    return 550. + field + rng.normal(0, 0.5, (size, size))
+
+
+def measure(func, repeat: int=1) -> tuple[float, float]:
+    """ 최소 실행시간(초)과 최대 임시메모리(MB)를 측정한다.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 2**20
+
+
+def labeler_cases(mask: np.ndarray) -> dict:
+    """ 레이블러별 측정 대상 함수
+    - label_connected_pixels[thread/process]: CPU 수만큼 행 띠(tile)로 나눈 병렬 레이블링
+      (직렬 label_connected_pixels 와 비교해서 타일 분할이 이득인지 확인, process 는 자식 프로세스
+      메모리가 측정에 포함되지 않음)
+    """
+    workers = os.cpu_count() or 1
+    band = (-(-mask.shape[0] // workers), mask.shape[1])
+    return {
+        "Segmentation.areas": lambda: Segmentation(mask).areas(),
+        "SegmentationWithDiagonal.areas": lambda: SegmentationWithDiagonal(mask).areas(),
+        "SegmentationWithDiagonal_recursion.areas": lambda: SegmentationWithDiagonal_recursion(mask).areas(),
+        "SegmentationWithDiagonal.label_connected_pixels":
+            lambda: SegmentationWithDiagonal(mask).label_connected_pixels(),
+        "label_connected_pixels": lambda: label_connected_pixels(mask),
+        "label_connected_pixels[thread]":
+            lambda: label_connected_pixels(mask, tile_shape=band, workers=workers, executor="thread"),
+        "label_connected_pixels[process]":
+            lambda: label_connected_pixels(mask, tile_shape=band, workers=workers, executor="process"),
+        "label_runs": lambda: label_runs(mask),
+        "largest_component_area": lambda: largest_component_area(mask),
+        "largest_component_area[block_rows=64]": lambda: largest_component_area(mask, block_rows=64),
+    }
+
+
+def tailsmura_cases(array: np.ndarray) -> dict:
+    """ TailsMura 클래스별 method x final 측정 대상 함수
+    - set_cutlines 가 마스크/비율 캐시를 비우므로 매번 기준선 설정부터 측정함
+    """
+    cases = {}
+    for cls in (TailsMura_Wavelength, TailsMura_Thickness):
+        tails = cls()
+        tails.set_array(array, (1, 1))
+        for method in METHODS:
+            for final in FINALS:
+                key = f"{cls.__name__}.get_tailsmura_index[{method},{final}]"
+                cases[key] = (lambda t=tails, m=method, f=final: (t.set_cutlines(25), t.get_tailsmura_index(m, f)))
+        cases[f"{cls.__name__}.get_tailsmura_indices"] = (
+            lambda t=tails: (t.set_cutlines(25), t.get_tailsmura_indices()))
+    return cases
+
+
+def run(sizes, patterns, repeat: int=1, seed: int=0) -> dict:
+    """ 전체 벤치마크 실행
+
+    Returns:
+        results (dict): {"대상/패턴/크기": {"time": 초, "peak_mb": MB}}
+    """
+    results = {}
+    for size in sizes:
+        for pattern in patterns:
+            mask = make_mask(pattern, size, seed=seed)
+            for name, func in labeler_cases(mask).items():
+                key = f"{name}/{pattern}/{size}"
+                elapsed, peak = measure(func, repeat)
+                results[key] = {"time": elapsed, "peak_mb": peak}
+                print(f"{key:70s} {elapsed*1e3:10.1f} ms {peak:9.1f} MB", flush=True)
+        array = make_wavelength_map(size, seed=seed)
+        for name, func in tailsmura_cases(array).items():
+            key = f"{name}/wavelength/{size}"
+            elapsed, peak = measure(func, repeat)
+            results[key] = {"time": elapsed, "peak_mb": peak}
+            print(f"{key:70s} {elapsed*1e3:10.1f} ms {peak:9.1f} MB", flush=True)
+    return results
+
+
+def compare(results: dict, baseline: dict, time_tolerance: float=0.5,
+            memory_tolerance: float=0.2) -> list[str]:
+    """ 기준 대비 허용치를 넘는 항목 목록
+
+    Args:
+        time_tolerance (float): 시간 허용 증가율(0.5: 50%)
+        memory_tolerance (float): 메모리 허용 증가율(0.2: 20%)
+    """
+    regressions = []
+    for key, value in results.items():
+        if key not in baseline:
+            continue
+        base = baseline[key]
+        if value["time"] > base["time"] * (1 + time_tolerance):
+            regressions.append(f"{key}: time {base['time']*1e3:.1f} -> {value['time']*1e3:.1f} ms")
+        if value["peak_mb"] > base["peak_mb"] * (1 + memory_tolerance) + 1.:
+            regressions.append(f"{key}: peak {base['peak_mb']:.1f} -> {value['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--patterns", nargs="+", default=list(PATTERNS), choices=PATTERNS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="결과를 기준 JSON으로 저장")
+    parser.add_argument("--time-tolerance", type=float, default=0.5)
+    parser.add_argument("--memory-tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.patterns, args.repeat, args.seed)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f"baseline saved: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline: {args.baseline} (run with --save-baseline first)")
+        return 1
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if not any(key in baseline for key in results):
+        print(f"no matching baseline entries: {args.baseline} (run with --save-baseline first)")
+        return 1
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for line in regressions:
+            print("  " + line)
+        return 1
+    print("\nno regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
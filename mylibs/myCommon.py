@@ -243,3 +243,211 @@ def average_dicts(a: dict, b: dict) -> dict:
     return result
 
 
+
+
+def _lerp(a: np.ndarray, b: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """ np.percentile(method='linear') 과 같은 방식의 선형보간
+    """
+    diff = b - a
+    return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+
+
+def get_nanpercentiles(a: np.ndarray, percents, repeat: int=1, step: float|None=None,
+                       overwrite_input: bool=False) -> np.ndarray:
+    """ NaN 을 제외한 여러 백분위수를 한번의 부분정렬(partition)로 계산한다.
+    - 결과는 np.nanpercentile(method='linear') 과 같음
+    - repeat: 모든 값이 repeat 번씩 들어있는 배열(np.tile 결과)의 백분위수를 원본만으로 계산
+    - 정수형이거나 step(양자화 간격) 지정시 도수분포(bincount)로 O(N) 계산,
+      실제 값이 step 격자에 없으면 부분정렬로 계산함
+
+    Args:
+        a (ndarray): 데이터
+        percents (float|list): 백분위(0~100)
+        repeat (int): 값별 반복 횟수(타일 개수), default=1
+        step (float): 데이터 양자화 간격(생략시 정수형만 도수분포 사용)
+        overwrite_input (bool): True 이면 a(1차원, NaN 없음)를 복사 없이 부분정렬함
+    Returns:
+        result (ndarray): 백분위수(percents 와 같은 모양), 유효값이 없으면 NaN
+    """
+    q = np.true_divide(np.asarray(percents, dtype=np.float64), 100)
+    values = np.asarray(a).ravel()
+    if values.dtype.kind == 'f' and not overwrite_input:
+        valid = ~np.isnan(values)
+        if not valid.all():
+            values = values[valid]
+    if values.size == 0:
+        return np.full(q.shape, np.nan)[()]
+
+    n = values.size * repeat
+    virtual = (n - 1) * q  # np.percentile(linear) 의 위치 계산식
+    virtual = np.clip(virtual, 0, n - 1)
+    lower = np.floor(virtual).astype(np.int64)
+    upper = np.minimum(lower + 1, n - 1)
+    t = virtual - lower
+    ranks = np.concatenate([lower.ravel(), upper.ravel()]) // repeat  # 원본 기준 순위
+
+    order_values = _counting_order_values(values, ranks, step)
+    if order_values is None:
+        kth = np.unique(ranks)
+        if overwrite_input:
+            values.partition(kth)
+        else:
+            values = np.partition(values, kth)
+        order_values = values[ranks]
+    below, above = np.split(order_values.astype(np.float64), 2)
+    return _lerp(below.reshape(q.shape), above.reshape(q.shape), t)[()]
+
+
+def _counting_order_values(values: np.ndarray, ranks: np.ndarray, step: float|None,
+                           max_bins: int=1 << 24) -> np.ndarray|None:
+    """ 도수분포 누적합으로 순위별 값을 구한다. (격자 밖 값이 있거나 구간이 너무 많으면 None)
+    """
+    if values.dtype.kind in 'iub':
+        low = values.min()
+        if int(values.max()) - int(low) >= max_bins:
+            return None
+        codes = (values - low).astype(np.intp)
+        counts = np.cumsum(np.bincount(codes))
+        return low + np.searchsorted(counts, ranks, side='right')
+    if step is None:
+        return None
+    low = values.min()
+    span = (values.max() - low) / step
+    if not span < max_bins:
+        return None
+    codes = np.rint((values - low) / step).astype(np.intp)
+    representative = np.zeros(int(codes.max()) + 1, dtype=values.dtype)
+    representative[codes] = values
+    if not np.array_equal(representative[codes], values):
+        return None
+    counts = np.cumsum(np.bincount(codes))
+    return representative[np.searchsorted(counts, ranks, side='right')]
+
+
+def get_sampled_nanpercentiles(a: np.ndarray, percents, sample_size: int=1 << 16,
+                               confidence: float=0.99, seed: int=0) -> tuple[np.ndarray, np.ndarray]:
+    """ 층화추출 표본으로 NaN 제외 백분위수를 근사하고 오차 한계를 함께 반환한다.
+    - 데이터를 sample_size 개의 연속 구간으로 나누고 구간마다 1개씩 무작위 추출(NaN 표본은 제외)
+    - 오차 한계: DKW 부등식으로 신뢰수준 confidence 에서 순위 오차 eps 를 구하고,
+      표본의 (p - eps, p + eps) 백분위수가 추정값에서 벗어난 최대 거리(데이터 단위)
+      (무작위 추출 기준 한계이며 층화추출은 이보다 오차가 작음)
+    - 표본 수가 데이터 수 이상이면 정확히 계산하고 오차 한계는 0
+
+    Args:
+        a (ndarray): 데이터
+        percents (float|list): 백분위(0~100)
+        sample_size (int): 표본 수, default=65536
+        confidence (float): 오차 한계의 신뢰수준, default=0.99
+        seed (int): 난수 seed(같은 seed 이면 같은 결과)
+    Returns:
+        estimates (ndarray): 근사 백분위수
+        errors (ndarray): 정확한 백분위수와의 최대 차이(데이터 단위)
+    """
+    values = np.asarray(a).reshape(-1)  # np.memmap 도 복사하지 않고 표본 위치만 읽음
+    percents = np.asarray(percents, dtype=np.float64)
+    if values.size <= sample_size:
+        return get_nanpercentiles(values, percents), np.zeros(percents.shape)[()]
+
+    rng = np.random.default_rng(seed)
+    bounds = np.arange(sample_size + 1) * values.size // sample_size
+    index = bounds[:-1] + (rng.random(sample_size) * np.diff(bounds)).astype(np.int64)
+    sample = np.asarray(values[index])
+    if sample.dtype.kind == 'f':
+        sample = sample[~np.isnan(sample)]  # NaN 은 표본에서 제외
+    if sample.size == 0:
+        return np.full(percents.shape, np.nan)[()], np.full(percents.shape, np.nan)[()]
+    eps = np.sqrt(np.log(2 / (1 - confidence)) / (2 * sample.size)) * 100
+    estimates, lower, upper = np.split(get_nanpercentiles(sample, np.concatenate([
+        percents.ravel(), np.clip(percents.ravel() - eps, 0, 100), np.clip(percents.ravel() + eps, 0, 100)])), 3)
+    errors = np.maximum(upper - estimates, estimates - lower)
+    return estimates.reshape(percents.shape)[()], errors.reshape(percents.shape)[()]
+
+
+def get_nanpercentiles_rows(a: np.ndarray, percents, repeat: int=1) -> np.ndarray:
+    """ 2차원 배열의 행마다 NaN 제외 백분위수를 한번에 계산한다. (행별 반복문 없음)
+    - 행 정렬 후 행별 유효값 개수로 순위를 구하므로 결과는 행별 get_nanpercentiles 와 같음
+
+    Args:
+        a (ndarray): 데이터(행 x 값)
+        percents (list): 백분위(0~100)
+        repeat (int): 값별 반복 횟수(타일 개수), default=1
+    Returns:
+        result (ndarray): 백분위수(행 x 백분위), 유효값이 없는 행은 NaN
+    """
+    q = np.true_divide(np.asarray(percents, dtype=np.float64).ravel(), 100)
+    ordered = np.sort(np.asarray(a, dtype=np.float64), axis=1)  # NaN 은 행 끝으로 정렬됨
+    counts = np.count_nonzero(~np.isnan(ordered), axis=1)
+    n = np.maximum(counts, 1)[:, np.newaxis] * repeat
+    virtual = np.clip((n - 1) * q, 0, n - 1)
+    lower = np.floor(virtual).astype(np.int64)
+    upper = np.minimum(lower + 1, n - 1)
+    below = np.take_along_axis(ordered, lower // repeat, axis=1)
+    above = np.take_along_axis(ordered, upper // repeat, axis=1)
+    result = _lerp(below, above, virtual - lower)
+    result[counts == 0] = np.nan
+    return result
+
+
+def get_nanpercentiles_chunked(a: np.ndarray, percents, repeat: int=1,
+                               block_pixels: int=1 << 20, bins: int=1 << 16) -> np.ndarray:
+    """ 큰 배열(np.memmap 등)의 NaN 제외 백분위수를 블록 단위로 정확히 계산한다.
+    - 1차: 블록별 최소/최대, 2차: 블록별 도수분포로 필요한 순위가 들어있는 구간을 찾고,
+      3차: 그 구간의 값만 모아 부분정렬함(임시 메모리는 블록 크기 + 선택 구간 크기)
+    - 결과는 get_nanpercentiles(np.nanpercentile) 와 같음
+
+    Args:
+        a (ndarray): 데이터(복사하지 않고 블록 단위로 읽음)
+        percents (float|list): 백분위(0~100)
+        repeat (int): 값별 반복 횟수(타일 개수), default=1
+        block_pixels (int): 한번에 읽을 최대 픽셀수
+        bins (int): 도수분포 구간 수
+    Returns:
+        result (ndarray): 백분위수(percents 와 같은 모양), 유효값이 없으면 NaN
+    """
+    flat = np.asarray(a).reshape(-1)
+    blocks = [flat[i:i + block_pixels] for i in range(0, flat.size, block_pixels)]
+    q = np.true_divide(np.asarray(percents, dtype=np.float64), 100)
+
+    count, low, high = 0, np.inf, -np.inf
+    for block in blocks:
+        block = block[~np.isnan(block)] if block.dtype.kind == 'f' else block
+        if block.size:
+            count += block.size
+            low, high = min(low, block.min()), max(high, block.max())
+    if count == 0:
+        return np.full(q.shape, np.nan)[()]
+
+    n = count * repeat
+    virtual = np.clip((n - 1) * q, 0, n - 1)
+    lower = np.floor(virtual).astype(np.int64)
+    upper = np.minimum(lower + 1, n - 1)
+    ranks = np.concatenate([lower.ravel(), upper.ravel()]) // repeat
+    if low == high:
+        order_values = np.full(ranks.size, low, dtype=np.float64)
+    else:
+        scale = bins / (float(high) - float(low))
+
+        def bin_of(values):
+            return np.minimum(((values - low) * scale).astype(np.int64), bins - 1)
+
+        histogram = np.zeros(bins, dtype=np.int64)
+        for block in blocks:
+            block = block[~np.isnan(block)] if block.dtype.kind == 'f' else block
+            histogram += np.bincount(bin_of(block), minlength=bins)
+        cumulative = np.cumsum(histogram)
+        rank_bins = np.searchsorted(cumulative, ranks, side='right')
+        wanted = np.zeros(bins, dtype=bool)
+        wanted[rank_bins] = True
+        selected = []
+        for block in blocks:
+            block = block[~np.isnan(block)] if block.dtype.kind == 'f' else block
+            selected.append(block[wanted[bin_of(block)]])
+        selected = np.concatenate(selected)
+        # 선택 구간들은 값 순서대로 이어지므로 선택값 안에서의 순위로 바꿔서 찾음
+        before = np.cumsum(np.where(wanted, histogram, 0)) - np.where(wanted, histogram, 0)
+        skipped = (cumulative - histogram)[rank_bins] - before[rank_bins]
+        local = ranks - skipped
+        selected.partition(np.unique(local))
+        order_values = selected[local]
+    below, above = np.split(np.asarray(order_values, dtype=np.float64), 2)
+    return _lerp(below.reshape(q.shape), above.reshape(q.shape), virtual - lower)[()]
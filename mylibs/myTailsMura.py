@@ -1,77 +1,251 @@
 # myTailsMura.py
 
+import time
+import tracemalloc
+
 import numpy as np
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import Literal
-from .myCommon import get_colorname_from_wavelength
+from .myCommon import (
+    get_colorname_from_wavelength,
+    get_nanpercentiles,
+    get_nanpercentiles_chunked,
+    get_nanpercentiles_rows,
+    get_sampled_nanpercentiles,
+)
 from .myColorVision import (
     Wavelength_JND_by_zhaoping_2011,
     Luminous_Efficiency,
 )
 from .mySegmentation import (
-    Segmentation,
-    SegmentationWithDiagonal,
+    ComponentTree,
+    PackedMask,
+    count_components,
+    filter_mask,
+    label_batch,
+    label_connected_pixels,
+    label_up_down,
+    label_runs,
+    largest_component_area,
+    regionprops,
+    run_length_areas,
 )
 
 
-class TailsMura_Wavelength:
-    """ 파장 치우침 비율 계산
-    - 상하좌우대각 최인접 연결면적 기준
-    - 최종결과는 상하위비율의 합계로 결정
+SWEEP_DTYPE = np.dtype([
+    ('percent', np.float64),  # 퍼센트
+    ('jnd_scale', np.float64),  # 인지임계값 배율
+    ('cutline_up', np.float64),  # 적용 상한선(method 기준)
+    ('cutline_down', np.float64),  # 적용 하한선(method 기준)
+    ('ratio', np.float64),  # 치우침 종합(final 기준)
+    ('ratio_up', np.float64),  # 상위 치우침(%)
+    ('ratio_down', np.float64),  # 하위 치우침(%)
+])
+
+
+STAGES = ("tile", "median", "percentiles", "mask", "prefilter", "segmentation")
+
+
+@contextmanager
+def _measure_stage(stats: dict, name: str, memory: bool=False, owned: bool=False):
+    """ 단계 실행시간(초)과 최대 임시메모리(byte)를 stats[name] 에 기록한다.
+    - 메모리는 memory=True 이고 tracemalloc 실행 중일 때만 측정(아니면 0), 단계 시작 시점 대비 증가분
+    - owned=True(측정용으로 직접 켠 tracemalloc)일 때만 최대값을 초기화하고, 아니면 호출자의
+      추적 상태를 건드리지 않고 전후 스냅샷으로 구함
+      (단계 중 최대값이 기존 최대값을 넘지 못하면 종료 시점 증가분으로 대체)
+    """
+    tracing = memory and tracemalloc.is_tracing()
+    if tracing:
+        if owned:
+            tracemalloc.reset_peak()
+        base, base_peak = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        used = 0
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            used = peak - base if owned or peak > base_peak else current - base
+        stats[name] = (time.perf_counter() - start, max(int(used), 0))
+
+
+class TailsMuraResult:
+    """ get_tailsmura_index(return_result=True) 결과: 치우침 지수와 단계별 진단 정보
+    - ratio, ratio_up, ratio_down = result 처럼 기존 반환값과 같이 풀어 쓸 수 있음
+
+    Attributes:
+        ratio, ratio_up, ratio_down (float): 치우침 종합, 상위/하위 치우침(%)
+        method, final (str): 기준선 종류, 최종 산출 방법
+        cutlines (tuple): 적용 (상한선, 하한선)
+        times (dict): 단계별 실행시간(초), 키는 STAGES 중 실행된 단계
+            tile/median: 마지막 set_array, percentiles: 마지막 set_cutlines,
+            mask/prefilter/segmentation: 이번 호출(캐시 사용 안하고 다시 계산)
+        peak_memory (dict): 단계별 최대 임시메모리(byte)
+            (set_array/set_cutlines 단계는 실행시간만 기록하고 메모리는 0)
+        mask_pixels (tuple): (상위, 하위) 마스크 픽셀수(prefilter 적용후)
+        components (tuple): (상위, 하위) 연결요소 수
     """
 
-    def __init__(self, array=None|np.ndarray):
-        self._jnd_func = Wavelength_JND_by_zhaoping_2011()
+    def __init__(self, ratio: float, ratio_up: float, ratio_down: float, method: str, final: str,
+                 cutlines: tuple[float, float], stats: dict, mask_pixels: tuple[int, int],
+                 components: tuple[int, int]):
+        self.ratio = ratio
+        self.ratio_up = ratio_up
+        self.ratio_down = ratio_down
+        self.method = method
+        self.final = final
+        self.cutlines = cutlines
+        self.times = {name: stats[name][0] for name in STAGES if name in stats}
+        self.peak_memory = {name: stats[name][1] for name in STAGES if name in stats}
+        self.mask_pixels = mask_pixels
+        self.components = components
+
+    def __iter__(self):
+        return iter((self.ratio, self.ratio_up, self.ratio_down))
+
+    def __repr__(self) -> str:
+        times = "".join(f" {name}={seconds*1e3:.1f}ms" for name, seconds in self.times.items())
+        peak = max(self.peak_memory.values(), default=0) / 2**20
+        return (f"TailsMuraResult({self.method}/{self.final} ratio={self.ratio:.4f} "
+                f"up={self.ratio_up:.4f} down={self.ratio_down:.4f} pixels={self.mask_pixels} "
+                f"components={self.components}{times} peak={peak:.1f}MB)")
+
+    def as_dict(self) -> dict:
+        """ 로그 기록용 1단계 dict(time_<단계>, peak_<단계> 포함)
+        """
+        row = {"method": self.method, "final": self.final, "ratio": self.ratio,
+               "ratio_up": self.ratio_up, "ratio_down": self.ratio_down,
+               "cutline_up": self.cutlines[0], "cutline_down": self.cutlines[1],
+               "pixels_up": self.mask_pixels[0], "pixels_down": self.mask_pixels[1],
+               "components_up": self.components[0], "components_down": self.components[1]}
+        row.update({f"time_{name}": seconds for name, seconds in self.times.items()})
+        row.update({f"peak_{name}": peak for name, peak in self.peak_memory.items()})
+        return row
+
+
+class _TailsMura_Base:
+    """ TailsMura_Wavelength, TailsMura_Thickness 공통 구현
+    - 기준선, 마스크/비율 캐시, 치우침 지수, 민감도 곡선, 창별 지도
+    - 하위 클래스는 __init__ 에서 _jnd_func(인지 임계값 함수)를 정한 뒤 super().__init__ 호출
+    """
 
+    def __init__(self, array=None|np.ndarray):
         self.percent = 25.  # 히스토그램 상하위 기준 비율
-        self.cutline_both_up = 0.  # 최종 상한선(퍼센트 and 파장)
-        self.cutline_both_down = 0.  # 최종 하한선(퍼센트 and 파장)
-        self.cutline_percent_up = 100.  # 파장 상한선 by Percent
-        self.cutline_percent_down = 0.  # 파장 하한선 by Percent
-        self.cutline_jnd_up = 0.  # 파장 상한선 by JND
-        self.cutline_jnd_down = 0.  # 파장 하한선 by JND
+        self.cutline_both_up = 0.  # 최종 상한선(퍼센트 and 임계값)
+        self.cutline_both_down = 0.  # 최종 하한선(퍼센트 and 임계값)
+        self.cutline_percent_up = 100.  # 상한선 by Percent
+        self.cutline_percent_down = 0.  # 하한선 by Percent
+        self.cutline_jnd_up = 0.  # 상한선 by JND
+        self.cutline_jnd_down = 0.  # 하한선 by JND
+        self.cutline_percent_error = (0., 0.)  # 근사 상하한선 by Percent 오차 한계(정확히 계산시 0)
+        self.periodic = False  # 상하/좌우 경계 연결 여부(set_array에서 지정)
+        self._component_trees = {}  # 연결요소 트리 캐시(set_array에서 초기화)
+        self._masks = {}  # 기준선별 마스크 캐시(set_array, set_cutlines에서 초기화)
+        self._ratios = {}  # 기준선별 최대 연결면적 비율 캐시(set_array, set_cutlines에서 초기화)
+        self._chunked = False  # np.memmap/읽기전용 입력이면 블록 단위 계산(set_array에서 지정)
+        self._stage_stats = {}  # set_array/set_cutlines 단계별 (실행시간, 0)(set_array에서 초기화)
 
         if isinstance(array, np.ndarray):
             self.set_array(array, (1, 1))
         else:
             self._array: np.ndarray
             self.median: float = 0.
-            self.jnd = 1.  # 파장인지임계값
+            self.median_error = 0.  # 근사 중앙값 오차 한계(정확히 계산시 0)
+            self.jnd = 1.  # 인지임계값
             self.colorname = ""
             self.area = 0.  # 픽셀수
             self.flag_array = False  # 데이터 설정 여부(set_array 실행후 True)
             self.flag_cutline = False  # 상하한선 설정 여부(set_cutline 실행후 True)
 
 
-    def set_array(self, array: np.ndarray, tile: tuple[int,int]=(2,2)):
+    def set_array(self, array: np.ndarray, tile: tuple[int,int]=(2,2), periodic: bool=False,
+                  step: float|None=None, sample_size: int|None=None):
         """ 치우침 계산할 데이터 설정
+        - 중앙값과 현재 percent 의 상하위 백분위수를 원본 데이터 한번의 부분정렬로 함께 계산
+          (타일링 배열과 결과 동일, set_cutlines 에서 같은 percent 는 다시 계산 안함)
+        - sample_size 지정시 층화추출 표본으로 근사(오차 한계는 median_error 에 기록)
 
         Args:
             array (list): 이미지 데이터
             tile (tuple): 이미지 타일링(rows x cols), 생략시 2x2
+            periodic (bool): True면 타일링 대신 상하/좌우 경계를 이어서 연결면적 계산
+                             (tile 무시, 이미지 복사 안함, 면적비율은 원본 이미지 기준)
+                             np.memmap, 읽기전용 배열은 periodic 또는 tile=(1,1)이면 복사 없이
+                             그대로 사용하고 백분위수와 마스크를 블록 단위로 계산함
+            step (float): 데이터 양자화 간격(지정시 도수분포로 백분위수 계산, 생략시 정수형만)
+            sample_size (int): 근사 계산용 표본 수(생략시 정확히 계산)
         """
-        self._array = np.array(np.tile(array, tile))
-        self.median = float(np.nanmedian(self._array))  # 파장중앙값
-        self.jnd = self.get_jnd(self.median)  # 파장인지임계값
+        self.periodic = periodic
+        self._panel_shape = np.shape(array)  # 원본 패널 크기(타일링 전)
+        self._component_trees = {}
+        self._masks = {}
+        self._ratios = {}
+        self._stage_stats = {}
+        with _measure_stage(self._stage_stats, "tile"):
+            if periodic or tuple(tile) == (1, 1):
+                self._array = np.asarray(array)
+                repeat = 1
+            else:
+                self._array = np.array(np.tile(array, tile))
+                repeat = int(np.prod(tile))
+        with _measure_stage(self._stage_stats, "median"):
+            # 파일/읽기전용 데이터는 복사하지 않고 블록 단위로 읽음
+            self._chunked = isinstance(array, np.memmap) or not np.asarray(array).flags.writeable
+            self._quantile_repeat = repeat
+            self._quantile_step = step
+            (median, up, down), (median_error, error_up, error_down) = self._get_percentiles(
+                [50, 100 - self.percent, self.percent], sample_size)
+            # {percent: (상한선, 하한선, 상한선 오차, 하한선 오차, 표본 수(None: 정확))}
+            self._percent_cutlines = {self.percent: (up, down, error_up, error_down, sample_size)}
+        self.median = float(median)  # 중앙값
+        self.median_error = float(median_error)  # 근사 중앙값 오차 한계(정확히 계산시 0)
+        self.jnd = self.get_jnd(self.median)  # 인지임계값
         self.colorname = get_colorname_from_wavelength(self.median)
         self.area = np.size(self._array)  # 이미지 총 픽셀수
         self.flag_array = True
         self.flag_cutline = False
 
 
-    def get_jnd(self, wave: float):
-        return float(self._jnd_func.get(wave))
+    def _get_percentiles(self, percents: list[float], sample_size: int|None=None
+                         ) -> tuple[np.ndarray, np.ndarray]:
+        """ 원본 데이터(NaN 제외) 기준 (백분위수, 오차 한계)
+        - 정확히 계산하면 타일링 배열의 np.nanpercentile 과 같고 오차 한계는 0
+        - 부분정렬용 NaN 제외 복사본은 호출마다 만들고 버림(객체에 패널 크기 복사본을 남기지 않음)
+        """
+        if sample_size is not None:  # 타일링 배열도 값 분포가 같으므로 복사 없이 표본 추출
+            return get_sampled_nanpercentiles(self._array, percents, sample_size=sample_size)
+        if self._chunked:  # 타일링했으면 타일링 배열을 그대로 블록 단위로 읽음
+            return get_nanpercentiles_chunked(self._array, percents), np.zeros(len(percents))
+        if self._quantile_repeat == 1:
+            source = self._array
+        else:  # 타일링 배열의 첫 타일 = 원본(복사 없는 view)
+            source = self._array[:self._panel_shape[0], :self._panel_shape[1]]
+        values = source[~np.isnan(source)] if source.dtype.kind == 'f' else source.flatten()
+        values = get_nanpercentiles(values, percents, repeat=self._quantile_repeat,
+                                    step=self._quantile_step, overwrite_input=True)
+        return values, np.zeros(len(percents))
 
-    def set_jnd(self, wave: float):
-        self.jnd = float(self._jnd_func.get(wave))
 
+    def get_jnd(self, value: float):
+        return float(self._jnd_func.get(value))
 
-    def set_cutlines(self, percent: float=25, jnd: float=-1):
-        """ 히스토그램 분포에 대한 상하위 기준 비율, 파장인지 임계값을 설정한다.
+    def set_jnd(self, value: float):
+        self.jnd = float(self._jnd_func.get(value))
+
+
+    def set_cutlines(self, percent: float=25, jnd: float=-1, sample_size: int|None=None):
+        """ 히스토그램 분포에 대한 상하위 기준 비율, 인지 임계값을 설정한다.
+        - sample_size 지정시 층화추출 표본으로 근사하고, 정확한 값과의 최대 차이(신뢰수준 99%)를
+          cutline_percent_error(상한선, 하한선)에 기록함(같은 percent 를 정확히 또는 더 큰 표본으로
+          구한 값이 있으면 그 값 사용)
 
         Args:
             percent (float): 퍼센트(default=25)
-            jnd (float): 파장인지 임계값 지정(-1: 파장임계값함수 사용)
+            jnd (float): 인지 임계값 지정(-1: 임계값함수 사용)
+            sample_size (int): 근사 계산용 표본 수(생략시 정확히 계산)
         """
         if jnd == -1:
             jnd = self.get_jnd(self.median)
@@ -79,9 +253,18 @@ class TailsMura_Wavelength:
         if self.flag_array:
             self.flag_cutline = True
             self.percent = percent
-
-            self.cutline_percent_up = np.nanpercentile(self._array, 100 - percent)
-            self.cutline_percent_down = np.nanpercentile(self._array, percent)
+            self._masks = {}
+            self._ratios = {}
+
+            with _measure_stage(self._stage_stats, "percentiles"):
+                cached = self._percent_cutlines.get(percent)
+                # 캐시가 정확한 값이거나 요청보다 큰 표본으로 구한 값일 때만 재사용
+                if cached is None or not (cached[4] is None or (sample_size is not None
+                                                                and cached[4] >= sample_size)):
+                    values, errors = self._get_percentiles([100 - percent, percent], sample_size)
+                    cached = self._percent_cutlines[percent] = (*values, *errors, sample_size)
+            self.cutline_percent_up, self.cutline_percent_down = cached[:2]
+            self.cutline_percent_error = (float(cached[2]), float(cached[3]))
 
             self.cutline_jnd_up = self.median + jnd/2
             self.cutline_jnd_down = self.median - jnd/2
@@ -97,43 +280,84 @@ class TailsMura_Wavelength:
         Args:
             method (str): 기준선 종류["percent", "jnd", "both"]
         Returns:
-            mask_up (ndarray): 기준선 적용 배열(0:이하, 1:초과)
-            mask_down (ndarray): 기준선 적용 배열(0:이상, 1:미만)
+            mask_up (ndarray): 기준선 적용 배열(bool, False:이하, True:초과)
+            mask_down (ndarray): 기준선 적용 배열(bool, False:이상, True:미만)
         """
-        mask_up, mask_down = np.zeros(self._array.shape), np.zeros(self._array.shape)
-        if self.flag_array and self.flag_cutline:
-            A = self._array
-            if method == 'percent':
-                mask_up = np.where(A > self.cutline_percent_up, 1, 0)
-                mask_down = np.where(A < self.cutline_percent_down, 1, 0)
-            elif method == 'jnd':
-                mask_up = np.where(A > self.cutline_jnd_up, 1, 0)
-                mask_down = np.where(A < self.cutline_jnd_down, 1, 0)
-            else:  # 'both'
-                mask_up = np.where(A > self.cutline_both_up, 1, 0)
-                mask_down = np.where(A < self.cutline_both_down, 1, 0)
-        return mask_up, mask_down
+        if not (self.flag_array and self.flag_cutline):
+            return np.zeros(self._array.shape, dtype=bool), np.zeros(self._array.shape, dtype=bool)
+        packed_up, packed_down = self._get_packed_masks(method)
+        return packed_up.to_mask(), packed_down.to_mask()
+
+
+    def _get_packed_masks(self, method: Literal["percent", "jnd", "both"]="both") -> tuple[PackedMask, PackedMask]:
+        """ 기준선별 (상위, 하위) 마스크를 비트 압축해서 캐시한다.
+        - 기준선 값이 같은 method 끼리는 같은 마스크를 공유함
+        """
+        cutline_up, cutline_down = self._get_cutlines(method)
+        key = (float(cutline_up), float(cutline_down))
+        if key not in self._masks:
+            self._masks[key] = (PackedMask.from_threshold(self._array, cutline_up, "up"),
+                                PackedMask.from_threshold(self._array, cutline_down, "down"))
+        return self._masks[key]
+
+
+    def get_array_tails_only(self, methods: str|tuple[str, ...]=("percent", "jnd", "both"),
+                             out: np.ndarray|dict|None=None, block_pixels: int=1 << 20
+                             ) -> np.ndarray|dict[str, np.ndarray]:
+        """ 기준선 밖(상한선 초과, 하한선 미만) 픽셀만 남긴 이미지를 데이터 한번 순회로 만든다.
+        - 행 블록마다 데이터를 한번 읽고 method 별 마스크를 곱해서 결과 배열에 바로 기록
+          (임시 배열은 블록 크기만 사용, 결과는 array*mask_up + array*mask_down 과 같음)
+
+        Args:
+            methods (str|tuple): 기준선 종류 또는 종류 목록["percent", "jnd", "both"]
+            out (ndarray|dict): 결과를 기록할 배열(methods 가 목록이면 {method: 배열}),
+                                생략한 method 는 새로 할당
+            block_pixels (int): 한번에 처리할 최대 픽셀수
+        Returns:
+            array (ndarray|dict): 치우침 이미지(methods 가 목록이면 {method: 이미지})
+        """
+        single = isinstance(methods, str)
+        if single:
+            methods = (methods,)
+            out = {methods[0]: out}
+        out = dict(out or {})
+        array = self._array
+        for method in methods:
+            if out.get(method) is None:
+                out[method] = np.empty(array.shape, dtype=np.result_type(array.dtype, np.bool_))
+            elif out[method].shape != array.shape:
+                raise ValueError(f"out shape {out[method].shape} != array shape {array.shape}")
+
+        flagged = self.flag_array and self.flag_cutline
+        cutlines = {method: self._get_cutlines(method) for method in methods}
+        block_rows = max(1, block_pixels // max(array.shape[1], 1))
+        for row0 in range(0, array.shape[0], block_rows):
+            block = array[row0:row0 + block_rows]
+            for method in methods:
+                target = out[method][row0:row0 + block_rows]
+                if not flagged:  # 기준선 설정 전에는 마스크가 모두 0
+                    np.multiply(block, False, out=target)
+                    continue
+                cutline_up, cutline_down = cutlines[method]
+                weight = block > cutline_up
+                if cutline_up < cutline_down:  # 상하위 영역이 겹치면 겹친 픽셀은 두번 더한 값
+                    weight = weight.view(np.uint8) + (block < cutline_down)
+                else:
+                    weight |= block < cutline_down
+                np.multiply(block, weight, out=target)
+        return out[methods[0]] if single else {method: out[method] for method in methods}
 
 
     def get_array_tails_only_by_percent(self) -> np.ndarray:
-        mask_up, mask_down = self.get_mask(method="percent")
-        array_up = self._array * mask_up
-        array_down = self._array * mask_down
-        return array_up + array_down
+        return self.get_array_tails_only("percent")
 
 
     def get_array_tails_only_by_jnd(self) -> np.ndarray:
-        mask_up, mask_down = self.get_mask(method="jnd")
-        array_up = self._array * mask_up
-        array_down = self._array * mask_down
-        return array_up + array_down
+        return self.get_array_tails_only("jnd")
 
 
     def get_array_tails_only_by_both(self) -> np.ndarray:
-        mask_up, mask_down = self.get_mask(method="both")
-        array_up = self._array * mask_up
-        array_down = self._array * mask_down
-        return array_up + array_down
+        return self.get_array_tails_only("both")
 
 
     def get_array_normalized_by_jnd(self, a: np.ndarray) -> np.ndarray:
@@ -144,6 +368,21 @@ class TailsMura_Wavelength:
         return result
 
 
+    def get_regionprops(self, method: Literal["percent", "jnd", "both"]="both") -> tuple[np.ndarray, np.ndarray]:
+        """ 상하위 치우침 영역별 위치와 크기(면적, 외곽박스, 무게중심, 값 합계)
+
+        Args:
+            method (str): 기준선 종류["percent", "jnd", "both"]
+        Returns:
+            props_up (ndarray): 상위 치우침 영역 특성(mySegmentation.REGIONPROPS_DTYPE)
+            props_down (ndarray): 하위 치우침 영역 특성(mySegmentation.REGIONPROPS_DTYPE)
+        """
+        mask_up, mask_down = self.get_mask(method=method)
+        labeled_up, _ = label_connected_pixels(mask_up, connectivity=8, wrap=self.periodic)
+        labeled_down, _ = label_connected_pixels(mask_down, connectivity=8, wrap=self.periodic)
+        return regionprops(labeled_up, self._array), regionprops(labeled_down, self._array)
+
+
     # def get_array_by_percent(self) -> tuple[np.ndarray, np.ndarray]:
     #     mask_up, mask_down = self.get_mask(method="percent")
     #     array_up = self._array * mask_up
@@ -166,13 +405,13 @@ class TailsMura_Wavelength:
 
 
     def get_weighted_average_ratio(self, ratio_up: float, ratio_down: float) -> float:
-        """ 파장 인지 민감도를 반영한 가중 평균 계산
+        """ 인지 민감도를 반영한 가중 평균 계산
 
         Args:
             ratio_up (float): 상위 치우침 면적비율(0~100%)
             ratio_down (float): 하위 치우침 면적비율(0~100%)
         Returns:
-            result (float): 가중 평균(파장 인지 민감도 반영)
+            result (float): 가중 평균(인지 민감도 반영)
         """
         result = 0
         if self.flag_array and self.flag_cutline:
@@ -191,15 +430,119 @@ class TailsMura_Wavelength:
         return result
 
 
+    def get_component_trees(self, levels: int|np.ndarray|None=256,
+                            levels_down: int|np.ndarray|None=-1) -> tuple[ComponentTree, ComponentTree]:
+        """ 상하위 치우침용 연결요소 트리(임계값별 최대 연결면적)를 구축한다.
+        - set_array 이후 1회 구축해 두면 set_cutlines를 바꿔가며 get_tailsmura_index를
+          반복 호출해도 다시 레이블링하지 않음(기준선이 트리 단계 임계값일 때만 자동 사용)
+
+        Args:
+            levels (int|ndarray|None): 분위수 단계 개수 또는 단계 임계값 목록, default=256
+                (None 이면 모든 값에서 정확하나 느림, mySegmentation.ComponentTree 참고)
+            levels_down (int|ndarray|None): 하위 트리 단계(-1: levels 와 같음), default=-1
+        Returns:
+            tree_up (ComponentTree): 상한선 초과 영역 트리
+            tree_down (ComponentTree): 하한선 미만 영역 트리
+        """
+        if levels_down is not None and np.ndim(levels_down) == 0 and levels_down == -1:
+            levels_down = levels
+        key = tuple(lv if lv is None or np.ndim(lv) == 0 else tuple(np.ravel(lv).tolist())
+                    for lv in (levels, levels_down))
+        if key not in self._component_trees:
+            self._component_trees[key] = (
+                ComponentTree(self._array, "up", connectivity=8, wrap=self.periodic, levels=levels),
+                ComponentTree(self._array, "down", connectivity=8, wrap=self.periodic, levels=levels_down))
+        return self._component_trees[key]
+
+
+    def _find_component_trees(self, cutline_up: float|np.ndarray,
+                              cutline_down: float|np.ndarray) -> tuple[ComponentTree, ComponentTree]|None:
+        """ 기준선들이 모두 단계 임계값인(정확한) 캐시된 트리 쌍, 없으면 None
+        """
+        for tree_up, tree_down in self._component_trees.values():
+            if (all(tree_up.is_exact(c) for c in np.ravel(cutline_up))
+                    and all(tree_down.is_exact(c) for c in np.ravel(cutline_down))):
+                return tree_up, tree_down
+        return None
+
+
+    def _get_cutlines(self, method: Literal["percent", "jnd", "both"]="both") -> tuple[float, float]:
+        """ 기준선 종류별 (상한선, 하한선)
+        """
+        if method == 'percent':
+            return self.cutline_percent_up, self.cutline_percent_down
+        elif method == 'jnd':
+            return self.cutline_jnd_up, self.cutline_jnd_down
+        else:  # 'both'
+            return self.cutline_both_up, self.cutline_both_down
+
+
+    def _get_ratios(self, method: Literal["percent", "jnd", "both"]="both",
+                    prefilter: dict|None=None) -> tuple[float, float]:
+        """ 상하위 최대 연결면적 비율(%), 기준선 값과 전처리 옵션별로 캐시함
+        """
+        cutline_up, cutline_down = self._get_cutlines(method)
+        key = (float(cutline_up), float(cutline_down), tuple(sorted((prefilter or {}).items())))
+        if key not in self._ratios:
+            self._ratios[key] = self._measure_ratios(method, prefilter)
+        return self._ratios[key]
+
+
+    def _measure_ratios(self, method: Literal["percent", "jnd", "both"]="both",
+                        prefilter: dict|None=None) -> tuple[float, float]:
+        """ 상하위 최대 연결면적 비율(%)
+        - prefilter 지정시 마스크에 전처리(mySegmentation.filter_mask)를 적용한 뒤 계산
+        - np.memmap/읽기전용 데이터는 압축 마스크를 행 블록씩 풀어서 계산(임시 메모리 절약)
+        """
+        ratio_up, ratio_down = 0, 0
+        if (prefilter or self._chunked) and self.flag_array and self.flag_cutline:
+            mask_up, mask_down = self._get_packed_masks(method)
+            if prefilter:
+                mask_up, mask_down = (filter_mask(mask, connectivity=8, wrap=self.periodic, **prefilter)
+                                      for mask in (mask_up, mask_down))
+            if mask_up.count() > 1:
+                ratio_up = largest_component_area(mask_up, connectivity=8, wrap=self.periodic)/self.area*100
+            if mask_down.count() > 1:
+                ratio_down = largest_component_area(mask_down, connectivity=8, wrap=self.periodic)/self.area*100
+            return ratio_up, ratio_down
+
+        cutline_up, cutline_down = self._get_cutlines(method)
+        trees = self._find_component_trees(cutline_up, cutline_down)
+        if trees is not None and self.flag_array and self.flag_cutline:
+            tree_up, tree_down = trees
+            if tree_up.count(cutline_up) > 1:
+                ratio_up = tree_up.largest_area(cutline_up)/self.area*100
+            if tree_down.count(cutline_down) > 1:
+                ratio_down = tree_down.largest_area(cutline_down)/self.area*100
+            return ratio_up, ratio_down
+
+        if self.flag_array and self.flag_cutline:
+            # 상하위 영역을 한번의 스캔으로 함께 레이블링
+            areas_up, areas_down = label_up_down(self._array, cutline_up, cutline_down,
+                                                 connectivity=8, wrap=self.periodic)
+            if np.sum(areas_up) > 1:
+                ratio_up = np.max(areas_up)/self.area*100
+            if np.sum(areas_down) > 1:
+                ratio_down = np.max(areas_down)/self.area*100
+        return ratio_up, ratio_down
+
+
     def get_tailsmura_index(self,
             method: Literal["percent", "jnd", "both"]="both",
-            final: Literal["sum", "max", "avg"]='sum') -> tuple[float, float, float]:
+            final: Literal["sum", "max", "avg"]='sum',
+            prefilter: dict|None=None,
+            return_result: bool=False) -> tuple[float, float, float]|TailsMuraResult:
         """ 상하위 비율 기준으로 치우침 지수(Tails Mura Index) 계산
 
         Args:
         -----
             method (str): 기준선 종류 ["percent", "jnd", "both"]
             final (str): 최종 산출 방법 ["sum", "max", "avg"], default='sum'
+            prefilter (dict): 레이블링 전 마스크 잡음 제거(생략시 사용안함)
+                {"opening": 열림 반복횟수, "closing": 닫힘 반복횟수, "min_area": 최소면적(픽셀)}
+                예) prefilter={"opening": 1} 은 3x3 보다 작은 점 잡음 제거
+            return_result (bool): True 이면 단계별 실행시간, 마스크 픽셀수, 연결요소 수,
+                최대 임시메모리를 담은 TailsMuraResult 반환(마스크/레이블링은 캐시 없이 다시 측정)
 
         Return:
         ------
@@ -207,298 +550,272 @@ class TailsMura_Wavelength:
             ratio_up (float): 상위 치우침(%)
             ratio_down (float): 하위 치우침(%)
         """
+        if return_result:
+            return self._get_tailsmura_result(method, final, prefilter)
         if final == 'max':
-            return self._get_tailsmura_index_max(method=method)
+            return self._get_tailsmura_index_max(method=method, prefilter=prefilter)
         elif final == 'avg':
-            return self._get_tailsmura_index_avg(method=method)
+            return self._get_tailsmura_index_avg(method=method, prefilter=prefilter)
         else: # default = 'sum'
-            result = self._get_tailsmura_index_max(method=method)
+            result = self._get_tailsmura_index_max(method=method, prefilter=prefilter)
             return result[1]+result[2], result[1], result[2]
 
 
-    def _get_tailsmura_index_max(self, method: Literal["percent", "jnd", "both"]="both") -> tuple[float, float, float]:
-        """ 상하위 비율 기준으로 치우침 지수(Tails Mura Index) 계산
-
-        Args:
-            method (str): 기준선 종류["percent", "jnd", "both"]
-        Return:
-            ratio (float): 상하위 치우침 최대값
-            ratio_up (float): 상위 치우침(%)
-            ratio_down (float): 하위 치우침(%)
-        """
-        mask_up, mask_down = self.get_mask(method=method)
-        ratio_up, ratio_down = 0, 0
-        if np.sum(mask_up) > 1:
-            segment_up = SegmentationWithDiagonal(mask_up)
-            area_up = segment_up.areas()
-            ratio_up = np.max(area_up)/np.size(mask_up)*100
-        if np.sum(mask_down) > 1:
-            segment_down = SegmentationWithDiagonal(mask_down)
-            area_down = segment_down.areas()
-            ratio_down = np.max(area_down)/np.size(mask_down)*100
-
-        # 가중평균(%)은 240510a 부터 사용안함
-        # ratio = self.get_weighted_average_ratio(ratio_up, ratio_down)
-        ratio = max(ratio_up, ratio_down)
-        return ratio, ratio_up, ratio_down
-
-
-    def _get_tailsmura_index_avg(self, method: Literal["percent", "jnd", "both"]="both") -> tuple[float, float, float]:
-        """ 상하위 비율 기준으로 치우침 지수(Tails Mura Index) 계산
-
-        Args:
-            method (str): 기준선 종류["percent", "jnd", "both"]
-        Return:
-            ratio (float): 상하위 치우침 가중평균값
-            ratio_up (float): 상위 치우침(%)
-            ratio_down (float): 하위 치우침(%)
+    def _get_tailsmura_result(self, method: Literal["percent", "jnd", "both"]="both",
+                              final: Literal["sum", "max", "avg"]='sum',
+                              prefilter: dict|None=None) -> TailsMuraResult:
+        """ 마스크 생성, 전처리, 레이블링을 단계별로 측정하며 치우침 지수를 계산한다.
+        - 연결요소 수를 세기 위해 구간 단위 전체 레이블링(label_runs)을 사용
+          (np.memmap/읽기전용 데이터는 행 블록 단위로 세어 임시 메모리를 제한, periodic 제외)
+        - 측정 중에는 tracemalloc 을 켜고(원래 꺼져 있었으면 끝나고 끔, 켜져 있었으면 최대값을
+          초기화하지 않음), 비율은 캐시에도 저장
         """
-        mask_up, mask_down = self.get_mask(method=method)
+        stats = dict(self._stage_stats)
         ratio_up, ratio_down = 0, 0
-        if np.sum(mask_up) > 1:
-            segment_up = SegmentationWithDiagonal(mask_up)
-            area_up = segment_up.areas()
-            ratio_up = np.max(area_up)/np.size(mask_up)*100
-        if np.sum(mask_down) > 1:
-            segment_down = SegmentationWithDiagonal(mask_down)
-            area_down = segment_down.areas()
-            ratio_down = np.max(area_down)/np.size(mask_down)*100
-
-        # 가중평균(%)은 240510a 부터 사용안함
-        ratio = self.get_weighted_average_ratio(ratio_up, ratio_down)
-        # ratio = max(ratio_up, ratio_down)
-        return ratio, ratio_up, ratio_down
-
-
-class Wavelength_TailsMura(TailsMura_Wavelength):
-    pass
-
-
-
-class TailsMura_Thickness:
-    """ 두께 치우침 비율 계산
-    - 상하좌우대각 최인접 연결면적 기준
-    - 최종 결과는 상하위비율의 합계로 결정
-    """
-
-    def __init__(self, array=None|np.ndarray):
-        self._jnd_func = JND_Thickness_With_Constant()
-
-        self.percent = 25.  # 히스토그램 상하위 기준 비율
-        self.cutline_both_up = 0.  # 최종 상한선(퍼센트 and 두께)
-        self.cutline_both_down = 0.  # 최종 하한선(퍼센트 and 두께)
-        self.cutline_percent_up = 100.  # 두께 상한선 by Percent
-        self.cutline_percent_down = 0.  # 두께 하한선 by Percent
-        self.cutline_jnd_up = 0.  # 두께 상한선 by JND
-        self.cutline_jnd_down = 0.  # 두께 하한선 by JND
-
-        if isinstance(array, np.ndarray):
-            self.set_array(array, (1, 1))
-        else:
-            self._array: np.ndarray
-            self.median: float = 0.
-            self.jnd = 1.  # 두께 변동폭 임계값
-            self.colorname = ""
-            self.area = 0.  # 픽셀수
-            self.flag_array = False  # 데이터 설정 여부(set_array 실행후 True)
-            self.flag_cutline = False  # 상하한선 설정 여부(set_cutline 실행후 True)
-
-
-    def set_array(self, array: np.ndarray, tile: tuple[int,int]=(2,2)):
-        """ 치우침 계산할 데이터 설정
-
-        Args:
-            array (list): 이미지 데이터
-            tile (tuple): 이미지 타일링(rows x cols), 생략시 2x2
-        """
-        self._array = np.array(np.tile(array, tile))
-        self.median = float(np.nanmedian(self._array))  # 중앙값
-        self.jnd = self.get_jnd(self.median)  # 임계값
-        self.colorname = get_colorname_from_wavelength(self.median)
-        self.area = np.size(self._array)  # 이미지 총 픽셀수
-        self.flag_array = True
-        self.flag_cutline = False
-
-
-    def get_jnd(self, thick: float):
-        return float(self._jnd_func.get(thick))
-
-    def set_jnd(self, thick: float):
-        self.jnd = float(self._jnd_func.get(thick))
-
-
-    def set_cutlines(self, percent: float=25, jnd: float=-1):
-        """ 히스토그램 분포에 대한 상하위 기준 비율, 임계값을 설정한다.
-
-        Args:
-            percent (float): 퍼센트(default=25)
-            jnd (float): 임계값 지정(-1: 임계값함수 사용)
-        """
-        if jnd == -1:
-            jnd = self.get_jnd(self.median)
-
-        if self.flag_array:
-            self.flag_cutline = True
-            self.percent = percent
-
-            self.cutline_percent_up = np.nanpercentile(self._array, 100 - percent)
-            self.cutline_percent_down = np.nanpercentile(self._array, percent)
-
-            self.cutline_jnd_up = self.median + jnd/2
-            self.cutline_jnd_down = self.median - jnd/2
+        cutline_up, cutline_down = self._get_cutlines(method)
+        mask_pixels, components = (0, 0), (0, 0)
+        if self.flag_array and self.flag_cutline:
+            tracing = tracemalloc.is_tracing()
+            if not tracing:
+                tracemalloc.start()
+            try:
+                with _measure_stage(stats, "mask", memory=True, owned=not tracing):
+                    masks = (PackedMask.from_threshold(self._array, cutline_up, "up"),
+                             PackedMask.from_threshold(self._array, cutline_down, "down"))
+                if prefilter:
+                    with _measure_stage(stats, "prefilter", memory=True, owned=not tracing):
+                        masks = tuple(filter_mask(mask, connectivity=8, wrap=self.periodic, **prefilter)
+                                      for mask in masks)
+                with _measure_stage(stats, "segmentation", memory=True, owned=not tracing):
+                    summaries = []  # 마스크별 (픽셀수, 연결요소 수, 최대 면적)
+                    for mask in masks:
+                        if self._chunked and not self.periodic:  # 블록 단위로 세어 임시 메모리 제한
+                            summaries.append((mask.count(), *count_components(mask, connectivity=8)))
+                            continue
+                        _, starts, ends, run_labels, n = label_runs(mask, connectivity=8, wrap=self.periodic)
+                        areas = run_length_areas(run_labels, starts, ends, n)
+                        summaries.append((int(np.sum(areas)), n, int(np.max(areas)) if n else 0))
+            finally:
+                if not tracing:
+                    tracemalloc.stop()
+            (pixels_up, n_up, largest_up), (pixels_down, n_down, largest_down) = summaries
+            mask_pixels, components = (pixels_up, pixels_down), (n_up, n_down)
+            if pixels_up > 1:
+                ratio_up = largest_up/self.area*100
+            if pixels_down > 1:
+                ratio_down = largest_down/self.area*100
+            key = (float(cutline_up), float(cutline_down), tuple(sorted((prefilter or {}).items())))
+            self._ratios[key] = (ratio_up, ratio_down)
 
-            # 'and' 조건
-            self.cutline_both_up = max([float(self.cutline_percent_up), self.cutline_jnd_up])
-            self.cutline_both_down = min([float(self.cutline_percent_down), self.cutline_jnd_down])
+        if final == 'max':
+            ratio = max(ratio_up, ratio_down)
+        elif final == 'avg':
+            ratio = self.get_weighted_average_ratio(ratio_up, ratio_down)
+        else:  # 'sum'
+            ratio = ratio_up + ratio_down
+        return TailsMuraResult(ratio, ratio_up, ratio_down, method, final,
+                               (float(cutline_up), float(cutline_down)), stats, mask_pixels, components)
 
 
-    def get_mask(self, method: Literal["percent", "jnd", "both"]="both") -> tuple[np.ndarray, np.ndarray]:
-        """ 지정한 기준선을 적용한 치우침 이미지용 마스크를 반환한다.
+    def get_tailsmura_indices(self,
+            methods: tuple[str, ...]=("percent", "jnd", "both"),
+            finals: tuple[str, ...]=("sum", "max", "avg"),
+            prefilter: dict|None=None) -> dict[tuple[str, str], tuple[float, float, float]]:
+        """ 기준선 종류 x 최종 산출 방법 조합의 치우침 지수를 한번에 계산한다.
+        - method 마다 상하위 비율은 한번만 계산하고 final 조합은 그 결과로 산출함
+        - 기준선 값이 같은 method 는 마스크/레이블링 결과를 공유함
 
         Args:
-            method (str): 기준선 종류["percent", "jnd", "both"]
+            methods (tuple): 기준선 종류 목록
+            finals (tuple): 최종 산출 방법 목록
+            prefilter (dict): 마스크 전처리 옵션(get_tailsmura_index 참고)
         Returns:
-            mask_up (ndarray): 기준선 적용 배열(0:이하, 1:초과)
-            mask_down (ndarray): 기준선 적용 배열(0:이상, 1:미만)
+            indices (dict): {(method, final): (ratio, ratio_up, ratio_down)}
         """
-        mask_up, mask_down = np.zeros(self._array.shape), np.zeros(self._array.shape)
-        if self.flag_array and self.flag_cutline:
-            A = self._array
-            if method == 'percent':
-                mask_up = np.where(A > self.cutline_percent_up, 1, 0)
-                mask_down = np.where(A < self.cutline_percent_down, 1, 0)
-            elif method == 'jnd':
-                mask_up = np.where(A > self.cutline_jnd_up, 1, 0)
-                mask_down = np.where(A < self.cutline_jnd_down, 1, 0)
-            else:  # 'both'
-                mask_up = np.where(A > self.cutline_both_up, 1, 0)
-                mask_down = np.where(A < self.cutline_both_down, 1, 0)
-        return mask_up, mask_down
-
-
-    def get_array_tails_only_by_percent(self) -> np.ndarray:
-        mask_up, mask_down = self.get_mask(method="percent")
-        array_up = self._array * mask_up
-        array_down = self._array * mask_down
-        return array_up + array_down
-
-
-    def get_array_tails_only_by_jnd(self) -> np.ndarray:
-        mask_up, mask_down = self.get_mask(method="jnd")
-        array_up = self._array * mask_up
-        array_down = self._array * mask_down
-        return array_up + array_down
-
-
-    def get_array_tails_only_by_both(self) -> np.ndarray:
-        mask_up, mask_down = self.get_mask(method="both")
-        array_up = self._array * mask_up
-        array_down = self._array * mask_down
-        return array_up + array_down
-
-
-    def get_array_normalized_by_jnd(self, a: np.ndarray) -> np.ndarray:
-        """ JND 기준 분포 이미지
-        """
-        a2 = np.where(a > 0, a - self.median, a)
-        result = a2 / (self.jnd/2)
-        return result
-
-
-    # def get_array_by_percent(self) -> tuple[np.ndarray, np.ndarray]:
-    #     mask_up, mask_down = self.get_mask(method="percent")
-    #     array_up = self._array * mask_up
-    #     array_down = self._array * mask_down
-    #     return array_up, array_down
-
-
-    # def get_array_by_color(self) -> tuple[np.ndarray, np.ndarray]:
-    #     mask_up, mask_down = self.get_mask(method="color")
-    #     array_up = self._array * mask_up
-    #     array_down = self._array * mask_down
-    #     return array_up, array_down
-
-
-    # def get_array_by_both(self) -> tuple[np.ndarray, np.ndarray]:
-    #     mask_up, mask_down = self.get_mask(method="both")
-    #     array_up = self._array * mask_up
-    #     array_down = self._array * mask_down
-    #     return array_up, array_down
-
-
-    def get_weighted_average_ratio(self, ratio_up: float, ratio_down: float) -> float:
-        """ 두께 인지 민감도를 반영한 가중 평균 계산
+        indices = {}
+        for method in methods:
+            ratio_up, ratio_down = self._get_ratios(method=method, prefilter=prefilter)
+            for final in finals:
+                if final == 'max':
+                    ratio = max(ratio_up, ratio_down)
+                elif final == 'avg':
+                    ratio = self.get_weighted_average_ratio(ratio_up, ratio_down)
+                else:  # 'sum'
+                    ratio = ratio_up + ratio_down
+                indices[(method, final)] = (ratio, ratio_up, ratio_down)
+        return indices
+
+
+    def sweep(self,
+            percents: float|np.ndarray|None=None,
+            jnd_scales: float|np.ndarray|None=None,
+            method: Literal["percent", "jnd", "both"]="both",
+            final: Literal["sum", "max", "avg"]='sum') -> np.ndarray:
+        """ 퍼센트/인지임계값 배율을 바꿔가며 치우침 지수 곡선을 한번에 계산한다.
+        - 모든 퍼센트의 상하위 백분위수는 한번의 부분정렬로 계산
+        - 연결면적은 곡선의 상한선/하한선을 각각 단계로 하는 연결요소 트리(get_component_trees)를
+          한번 구축한 뒤 기준선마다 조회만 함(구간을 단계 순서로 한번씩만 병합)
+        - 비용은 점 개수와 거의 무관하고 트리 구축이 대부분임(1024x1024 기준 50점 곡선이
+          get_tailsmura_index 2~7회 분량, 잡음이 클수록 레이블링 대비 유리)
+        - percents 와 jnd_scales 는 같은 길이로 짝지어짐(한쪽 생략시 현재 설정값 고정)
+          예) sweep(percents=np.arange(10, 41)), sweep(jnd_scales=np.linspace(0.5, 2, 50))
 
         Args:
-            ratio_up (float): 상위 치우침 면적비율(0~100%)
-            ratio_down (float): 하위 치우침 면적비율(0~100%)
+            percents (float|ndarray): 퍼센트 목록(생략시 현재 percent)
+            jnd_scales (float|ndarray): 인지임계값 배율 목록(생략시 1, 현재 설정된 JND 기준)
+            method (str): 기준선 종류 ["percent", "jnd", "both"]
+            final (str): 최종 산출 방법 ["sum", "max", "avg"], default='sum'
         Returns:
-            result (float): 가중 평균(두께 인지 민감도 반영)
+            curve (ndarray): 점별 결과(SWEEP_DTYPE: percent, jnd_scale, cutline_up, cutline_down,
+                             ratio, ratio_up, ratio_down), set_cutlines 후 get_tailsmura_index 결과와 같음
         """
-        result = 0
-        if self.flag_array and self.flag_cutline:
-            if (390 < self.cutline_both_up < 830) and (390 < self.cutline_both_down < 830):
-                luminous_efficiency = Luminous_Efficiency()
-                lumeff_up = float(luminous_efficiency.get(self.cutline_both_up))
-                lumeff_down = float(luminous_efficiency.get(self.cutline_both_down))
-                lumeff_sum = lumeff_up + lumeff_down
-                weight_up, weight_down = lumeff_up/lumeff_sum, lumeff_down/lumeff_sum
-            else:
-                weight_up, weight_down = 1, 1
-            result = weight_up*ratio_up + weight_down*ratio_down
-            # print(f"get_weighted_average_ratio: "
-            #     + f"weight(up,down)=({weight_up:.2f}, {weight_down:.2f})"
-            #     + f"ratio(up,down)=({ratio_up:.2f}%, {ratio_down:.2f}%)")
-        return result
+        percents, jnd_scales = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(self.percent if percents is None else percents, dtype=np.float64)),
+            np.atleast_1d(np.asarray(1. if jnd_scales is None else jnd_scales, dtype=np.float64)))
+        curve = np.zeros(percents.size, dtype=SWEEP_DTYPE)
+        curve['percent'], curve['jnd_scale'] = percents, jnd_scales
+        if not self.flag_array:
+            return curve
+
+        if self.flag_cutline:
+            jnd = self.cutline_jnd_up - self.cutline_jnd_down
+        else:
+            jnd = self.get_jnd(self.median)
+        unique_percents, inverse = np.unique(percents, return_inverse=True)
+        values, _ = self._get_percentiles(np.concatenate([100 - unique_percents, unique_percents]))
+        percent_up, percent_down = (part[inverse] for part in np.split(np.asarray(values), 2))
+        jnd_up, jnd_down = self.median + jnd*jnd_scales/2, self.median - jnd*jnd_scales/2
+        both_up, both_down = np.maximum(percent_up, jnd_up), np.minimum(percent_down, jnd_down)
+        if method == 'percent':
+            cutline_up, cutline_down = percent_up, percent_down
+        elif method == 'jnd':
+            cutline_up, cutline_down = jnd_up, jnd_down
+        else:  # 'both'
+            cutline_up, cutline_down = both_up, both_down
+
+        trees = self._find_component_trees(cutline_up, cutline_down)  # 정확한 트리가 이미 있으면 재사용
+        if trees is None:  # 곡선의 기준선에서만 정확한 단계 트리(상하위 따로, 영역 밖 픽셀은 병합 안 함)
+            trees = self.get_component_trees(np.unique(cutline_up), np.unique(cutline_down))
+        tree_up, tree_down = trees
+        ratio_up = np.where(tree_up.count(cutline_up) > 1, tree_up.largest_area(cutline_up)/self.area*100, 0.)
+        ratio_down = np.where(tree_down.count(cutline_down) > 1, tree_down.largest_area(cutline_down)/self.area*100, 0.)
+        if final == 'max':
+            ratio = np.maximum(ratio_up, ratio_down)
+        elif final == 'avg':
+            ratio = _get_weighted_average_ratios(both_up, both_down, ratio_up, ratio_down)
+        else:  # 'sum'
+            ratio = ratio_up + ratio_down
+        curve['cutline_up'], curve['cutline_down'] = cutline_up, cutline_down
+        curve['ratio'], curve['ratio_up'], curve['ratio_down'] = ratio, ratio_up, ratio_down
+        return curve
 
 
-    def get_tailsmura_index(self,
+    def get_tailsmura_heatmap(self,
+            window: tuple[int,int]=(64,64),
+            stride: tuple[int,int]|None=None,
             method: Literal["percent", "jnd", "both"]="both",
-            final: Literal["sum", "max", "avg"]='sum'
-        ) -> tuple[float, float, float]:
-
-        """ 상하위 비율 기준으로 치우침 지수(Tails Mura Index) 계산
+            final: Literal["sum", "max", "avg"]='sum',
+            local: bool=True,
+            percent: float|None=None,
+            jnd: float=-1,
+            workers: int|None=None) -> np.ndarray:
+        """ 원본 패널을 창(window) 격자로 나눠 창별 치우침 지수 지도(heatmap)를 만든다.
+        - local=True: 창마다 패널처럼 중앙값/백분위수/JND 기준선을 따로 계산
+          (창 묶음을 행 정렬 한번으로 처리, get_tailsmura_index_batch(tile=(1,1)) 와 같음)
+        - local=False: set_cutlines 의 패널 기준선을 그대로 쓰고 적분 이미지로 구한 창별 픽셀수가
+          2 이상인 창만 레이블링(어느 위치에 치우침이 몰려 있는지 표시)
+        - 창은 경계를 넘지 않으며(타일링/periodic 무시) 창 행 단위로 스레드 병렬 처리
 
         Args:
-        -----
+            window (tuple): 창 크기(rows, cols), default=(64,64)
+            stride (tuple): 창 이동 간격(rows, cols), 생략시 창 크기(겹치지 않는 블록)
             method (str): 기준선 종류 ["percent", "jnd", "both"]
             final (str): 최종 산출 방법 ["sum", "max", "avg"], default='sum'
-
-        Return:
-        ------
-            ratio (float): 치우침 종합(최대,합계,가중평균 중 택일)
-            ratio_up (float): 상위 치우침(%)
-            ratio_down (float): 하위 치우침(%)
+            local (bool): 창별 기준선 사용 여부, default=True
+            percent (float): local=True 일 때 퍼센트(생략시 현재 percent)
+            jnd (float): local=True 일 때 인지 임계값 지정(-1: 창 중앙값의 임계값함수 사용)
+            workers (int): 병렬 작업자 수(생략시 ThreadPoolExecutor 기본값)
+        Returns:
+            heatmap (ndarray): 창 격자 결과(창 행 x 창 열, HEATMAP_DTYPE: row, col, ratio,
+                               ratio_up, ratio_down, median, cutline_up, cutline_down)
         """
+        window_rows, window_cols = int(window[0]), int(window[1])
+        stride_rows, stride_cols = (window_rows, window_cols) if stride is None else (int(stride[0]), int(stride[1]))
+        if min(window_rows, window_cols, stride_rows, stride_cols) < 1:
+            raise ValueError(f"window and stride must be positive: {window}, {stride}")
+        if not self.flag_array:
+            return np.zeros((0, 0), dtype=HEATMAP_DTYPE)
+
+        height, width = self._panel_shape
+        panel = self._array[:height, :width]  # 타일링 배열의 첫 타일 = 원본 패널(복사 없음)
+        rows = np.arange(0, max(height - window_rows + 1, 0), stride_rows)
+        cols = np.arange(0, max(width - window_cols + 1, 0), stride_cols)
+        heatmap = np.zeros((rows.size, cols.size), dtype=HEATMAP_DTYPE)
+        heatmap['row'], heatmap['col'] = np.meshgrid(rows, cols, indexing='ij')
+        if heatmap.size == 0 or not (local or self.flag_cutline):
+            return heatmap
+        # 창 묶음은 복사 없는 view, 창 행 하나씩 작업자에게 넘김
+        windows = np.lib.stride_tricks.sliding_window_view(
+            panel, (window_rows, window_cols))[::stride_rows, ::stride_cols][:rows.size, :cols.size]
+
+        if local:  # 창마다 자체 중앙값/백분위수/JND 기준선(창 묶음 행 정렬 + label_batch)
+            percent = self.percent if percent is None else percent
+
+            def score_row(i: int) -> np.ndarray:
+                return get_tailsmura_index_batch(windows[i], type(self), method, final, percent, jnd, tile=(1, 1))
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for i, result in enumerate(pool.map(score_row, range(rows.size))):
+                    for name in TAILSMURA_BATCH_DTYPE.names:
+                        if name in HEATMAP_DTYPE.names:
+                            heatmap[name][i] = result[name]
+            return heatmap
+
+        # 패널 기준선: 적분 이미지로 창별 픽셀수를 구하고 2픽셀 이상인 창만 레이블링
+        cutline_up, cutline_down = self._get_cutlines(method)
+        area = window_rows * window_cols
+        ratios = []
+        for mask in (panel > cutline_up, panel < cutline_down):
+            pixels = _window_sums(mask, rows, cols, window_rows, window_cols)
+            mask_windows = np.lib.stride_tricks.sliding_window_view(
+                mask, (window_rows, window_cols))[::stride_rows, ::stride_cols][:rows.size, :cols.size]
+
+            def label_row(i: int, mask_windows=mask_windows, pixels=pixels) -> np.ndarray:
+                selected = np.flatnonzero(pixels[i] > 1)
+                ratio = np.zeros(cols.size)
+                if selected.size:
+                    max_areas, _ = label_batch(mask_windows[i][selected], connectivity=8)
+                    ratio[selected] = max_areas / area * 100
+                return ratio
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                ratios.append(np.stack(list(pool.map(label_row, range(rows.size)))))
+        ratio_up, ratio_down = ratios
+
         if final == 'max':
-            return self._get_tailsmura_index_max(method=method)
+            ratio = np.maximum(ratio_up, ratio_down)
         elif final == 'avg':
-            return self._get_tailsmura_index_avg(method=method)
-        else: # default = 'sum'
-            result = self._get_tailsmura_index_max(method=method)
-            return result[1]+result[2], result[1], result[2]
+            ratio = self.get_weighted_average_ratio(ratio_up, ratio_down)
+        else:  # 'sum'
+            ratio = ratio_up + ratio_down
+        heatmap['ratio'], heatmap['ratio_up'], heatmap['ratio_down'] = ratio, ratio_up, ratio_down
+        heatmap['median'], heatmap['cutline_up'], heatmap['cutline_down'] = self.median, cutline_up, cutline_down
+        return heatmap
 
 
-    def _get_tailsmura_index_max(self, method: Literal["percent", "jnd", "both"]="both") -> tuple[float, float, float]:
+    def _get_tailsmura_index_max(self, method: Literal["percent", "jnd", "both"]="both",
+                                 prefilter: dict|None=None) -> tuple[float, float, float]:
         """ 상하위 비율 기준으로 치우침 지수(Tails Mura Index) 계산
 
         Args:
             method (str): 기준선 종류["percent", "jnd", "both"]
+            prefilter (dict): 마스크 전처리 옵션(get_tailsmura_index 참고)
         Return:
             ratio (float): 상하위 치우침 최대값
             ratio_up (float): 상위 치우침(%)
             ratio_down (float): 하위 치우침(%)
         """
-        mask_up, mask_down = self.get_mask(method=method)
-        ratio_up, ratio_down = 0, 0
-        if np.sum(mask_up) > 1:
-            segment_up = SegmentationWithDiagonal(mask_up)
-            area_up = segment_up.areas()
-            ratio_up = np.max(area_up)/np.size(mask_up)*100
-        if np.sum(mask_down) > 1:
-            segment_down = SegmentationWithDiagonal(mask_down)
-            area_down = segment_down.areas()
-            ratio_down = np.max(area_down)/np.size(mask_down)*100
+        ratio_up, ratio_down = self._get_ratios(method=method, prefilter=prefilter)
 
         # 가중평균(%)은 240510a 부터 사용안함
         # ratio = self.get_weighted_average_ratio(ratio_up, ratio_down)
@@ -506,26 +823,19 @@ class TailsMura_Thickness:
         return ratio, ratio_up, ratio_down
 
 
-    def _get_tailsmura_index_avg(self, method: Literal["percent", "jnd", "both"]="both") -> tuple[float, float, float]:
+    def _get_tailsmura_index_avg(self, method: Literal["percent", "jnd", "both"]="both",
+                                 prefilter: dict|None=None) -> tuple[float, float, float]:
         """ 상하위 비율 기준으로 치우침 지수(Tails Mura Index) 계산
 
         Args:
             method (str): 기준선 종류["percent", "jnd", "both"]
+            prefilter (dict): 마스크 전처리 옵션(get_tailsmura_index 참고)
         Return:
             ratio (float): 상하위 치우침 가중평균값
             ratio_up (float): 상위 치우침(%)
             ratio_down (float): 하위 치우침(%)
         """
-        mask_up, mask_down = self.get_mask(method=method)
-        ratio_up, ratio_down = 0, 0
-        if np.sum(mask_up) > 1:
-            segment_up = SegmentationWithDiagonal(mask_up)
-            area_up = segment_up.areas()
-            ratio_up = np.max(area_up)/np.size(mask_up)*100
-        if np.sum(mask_down) > 1:
-            segment_down = SegmentationWithDiagonal(mask_down)
-            area_down = segment_down.areas()
-            ratio_down = np.max(area_down)/np.size(mask_down)*100
+        ratio_up, ratio_down = self._get_ratios(method=method, prefilter=prefilter)
 
         # 가중평균(%)은 240510a 부터 사용안함
         ratio = self.get_weighted_average_ratio(ratio_up, ratio_down)
@@ -533,11 +843,190 @@ class TailsMura_Thickness:
         return ratio, ratio_up, ratio_down
 
 
+
+class TailsMura_Wavelength(_TailsMura_Base):
+    """ 파장 치우침 비율 계산
+    - 상하좌우대각 최인접 연결면적 기준
+    - 최종결과는 상하위비율의 합계로 결정
+    """
+
+    def __init__(self, array=None|np.ndarray):
+        self._jnd_func = Wavelength_JND_by_zhaoping_2011()
+        super().__init__(array)
+
+    def get_jnd(self, wave: float):
+        return float(self._jnd_func.get(wave))
+
+    def set_jnd(self, wave: float):
+        self.jnd = float(self._jnd_func.get(wave))
+
+
+
+class Wavelength_TailsMura(TailsMura_Wavelength):
+    pass
+
+
+
+class TailsMura_Thickness(_TailsMura_Base):
+    """ 두께 치우침 비율 계산
+    - 상하좌우대각 최인접 연결면적 기준
+    - 최종 결과는 상하위비율의 합계로 결정
+    """
+
+    def __init__(self, array=None|np.ndarray):
+        self._jnd_func = JND_Thickness_With_Constant()
+        super().__init__(array)
+
+    def get_jnd(self, thick: float):
+        return float(self._jnd_func.get(thick))
+
+    def set_jnd(self, thick: float):
+        self.jnd = float(self._jnd_func.get(thick))
+
+
+
 class Thickness_TailsMura(TailsMura_Thickness):
     pass
 
 
 
+TAILSMURA_BATCH_DTYPE = np.dtype([
+    ('ratio', np.float64),  # 치우침 종합(final 기준)
+    ('ratio_up', np.float64),  # 상위 치우침(%)
+    ('ratio_down', np.float64),  # 하위 치우침(%)
+    ('median', np.float64),  # 중앙값
+    ('jnd', np.float64),  # 인지임계값
+    ('cutline_up', np.float64),  # 적용 상한선(method 기준)
+    ('cutline_down', np.float64),  # 적용 하한선(method 기준)
+])
+
+
+def get_tailsmura_index_batch(panels: np.ndarray|list[np.ndarray],
+        tails_class: type=TailsMura_Wavelength,
+        method: Literal["percent", "jnd", "both"]="both",
+        final: Literal["sum", "max", "avg"]='sum',
+        percent: float=25, jnd: float=-1, tile: tuple[int,int]=(2,2),
+        block_pixels: int=1<<22) -> np.ndarray:
+    """ 여러 패널의 치우침 지수를 객체 생성 없이 한번에 계산한다.
+    - 패널별 중앙값/백분위수는 행 정렬 한번으로 함께 계산(타일링 배열과 결과 동일)
+    - 상하위 마스크는 모든 패널을 쌓아 mySegmentation.label_batch 로 한번에 레이블링
+    - 크기가 다른 패널 목록은 같은 크기끼리 묶고, 묶음은 block_pixels 단위 패널 묶음으로 나눠 처리함
+      (임시 메모리가 패널 수와 무관, 스택이 np.memmap 이면 묶음만 읽음)
+    - 결과는 패널마다 tails_class 객체로 set_array(tile), set_cutlines, get_tailsmura_index
+      를 호출한 결과와 같음
+
+    Args:
+        panels (ndarray|list): 패널 스택(N x H x W) 또는 2차원 배열 목록
+        tails_class (type): TailsMura_Wavelength 또는 TailsMura_Thickness(JND 함수 결정)
+        method (str): 기준선 종류 ["percent", "jnd", "both"]
+        final (str): 최종 산출 방법 ["sum", "max", "avg"], default='sum'
+        percent (float): 퍼센트(default=25)
+        jnd (float): 인지 임계값 지정(-1: 임계값함수 사용)
+        tile (tuple): 이미지 타일링(rows x cols), default=(2,2)
+        block_pixels (int): 한번에 처리할 최대 픽셀수(타일링 전, 최소 1장)
+    Returns:
+        result (ndarray): 패널별 결과(TAILSMURA_BATCH_DTYPE)
+    """
+    if isinstance(panels, np.ndarray):
+        groups = {panels.shape[1:]: np.arange(len(panels))}
+    else:
+        groups = {}
+        for index, panel in enumerate(panels):
+            groups.setdefault(np.shape(panel), []).append(index)
+    result = np.zeros(len(panels), dtype=TAILSMURA_BATCH_DTYPE)
+    tails = tails_class()
+    repeat = int(np.prod(tile))
+
+    for shape, indices in groups.items():
+        indices = np.asarray(indices)
+        step = max(1, block_pixels // max(1, int(np.prod(shape))))
+        for first in range(0, len(indices), step):
+            part = indices[first:first + step]
+            if isinstance(panels, np.ndarray):
+                stack = np.asarray(panels[first:first + step], dtype=np.float64)
+            else:
+                stack = np.stack([np.asarray(panels[i], dtype=np.float64) for i in part])
+            flat = stack.reshape(len(part), -1)
+            medians, percent_up, percent_down = get_nanpercentiles_rows(
+                flat, [50, 100 - percent, percent], repeat).T
+            if jnd == -1:
+                jnds = np.array([tails.get_jnd(median) for median in medians])
+            else:
+                jnds = np.full(len(part), jnd)
+            both_up = np.maximum(percent_up, medians + jnds/2)
+            both_down = np.minimum(percent_down, medians - jnds/2)
+            if method == 'percent':
+                cutline_up, cutline_down = percent_up, percent_down
+            elif method == 'jnd':
+                cutline_up, cutline_down = medians + jnds/2, medians - jnds/2
+            else:  # 'both'
+                cutline_up, cutline_down = both_up, both_down
+
+            # 상위/하위 마스크를 함께 쌓아서 한번에 레이블링(타일링 마스크 = 마스크의 타일링)
+            masks = np.concatenate([stack > cutline_up[:, np.newaxis, np.newaxis],
+                                    stack < cutline_down[:, np.newaxis, np.newaxis]])
+            masks = np.tile(masks, (1, *tile))
+            max_areas, _ = label_batch(masks, connectivity=8)
+            pixels = np.count_nonzero(masks.reshape(len(masks), -1), axis=1)
+            area = masks.shape[1] * masks.shape[2]
+            ratios = np.where(pixels > 1, max_areas / area * 100, 0.)
+            ratio_up, ratio_down = np.split(ratios, 2)
+
+            if final == 'max':
+                ratio = np.maximum(ratio_up, ratio_down)
+            elif final == 'avg':
+                ratio = _get_weighted_average_ratios(both_up, both_down, ratio_up, ratio_down)
+            else:  # 'sum'
+                ratio = ratio_up + ratio_down
+            for name, values in (('ratio', ratio), ('ratio_up', ratio_up), ('ratio_down', ratio_down),
+                                 ('median', medians), ('jnd', jnds),
+                                 ('cutline_up', cutline_up), ('cutline_down', cutline_down)):
+                result[name][part] = values
+    return result
+
+
+def _get_weighted_average_ratios(cutline_up: np.ndarray, cutline_down: np.ndarray,
+                                 ratio_up: np.ndarray, ratio_down: np.ndarray) -> np.ndarray:
+    """ get_weighted_average_ratio 의 배열 버전(cutline_up/down 은 'both' 상하한선)
+    """
+    visible = (390 < cutline_up) & (cutline_up < 830) & (390 < cutline_down) & (cutline_down < 830)
+    luminous_efficiency = Luminous_Efficiency()
+    lumeff_up = luminous_efficiency.get(cutline_up)
+    lumeff_down = luminous_efficiency.get(cutline_down)
+    lumeff_sum = lumeff_up + lumeff_down
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight_up = np.where(visible, lumeff_up / lumeff_sum, 1.)
+        weight_down = np.where(visible, lumeff_down / lumeff_sum, 1.)
+    return weight_up*ratio_up + weight_down*ratio_down
+
+
+
+HEATMAP_DTYPE = np.dtype([
+    ('row', np.int64),  # 창 시작 행(원본 패널 기준)
+    ('col', np.int64),  # 창 시작 열
+    ('ratio', np.float64),  # 치우침 종합(final 기준)
+    ('ratio_up', np.float64),  # 상위 치우침(창 면적 대비 %)
+    ('ratio_down', np.float64),  # 하위 치우침(창 면적 대비 %)
+    ('median', np.float64),  # 중앙값(local=False 이면 패널 중앙값)
+    ('cutline_up', np.float64),  # 적용 상한선(method 기준)
+    ('cutline_down', np.float64),  # 적용 하한선(method 기준)
+])
+
+
+def _window_sums(mask: np.ndarray, rows: np.ndarray, cols: np.ndarray,
+                 window_rows: int, window_cols: int) -> np.ndarray:
+    """ 적분 이미지(summed-area table)로 창별 전경 픽셀수를 구한다. (창 크기와 무관하게 창마다 4번 조회)
+    """
+    height, width = mask.shape
+    dtype = np.int32 if height * width < 2**31 else np.int64
+    integral = np.zeros((height + 1, width + 1), dtype=dtype)
+    np.cumsum(np.cumsum(mask, axis=0, dtype=dtype), axis=1, out=integral[1:, 1:])
+    r0, c0 = rows[:, np.newaxis], cols[np.newaxis, :]
+    r1, c1 = r0 + window_rows, c0 + window_cols
+    return integral[r1, c1] - integral[r0, c1] - integral[r1, c0] + integral[r0, c0]
+
+
+
 class TailsMura_Fixed_JND:
     """ 치우침 비율 계산
     """
@@ -570,7 +1059,7 @@ class TailsMura_Fixed_JND:
             tile (tuple): 행열 반복횟수(rows x cols), 생략시 원본과 동일
         """
         self._array = np.array(np.tile(array, tile))
-        self.median = np.nanmedian(self._array)
+        self.median = get_nanpercentiles(array, 50, repeat=int(np.prod(tile)))
         self.area = np.size(self._array)
         self.flag_array = True
         self.flag_cutline = False
@@ -611,11 +1100,11 @@ class TailsMura_Fixed_JND:
         if self.flag_array:
             self.flag_cutline = True
             self.set_percent(percent)
-            self.cutline_percent_up = np.nanpercentile(self._array, 100 - self.percent)
-            self.cutline_percent_down = np.nanpercentile(self._array, self.percent)
+            # 상하위 백분위수와 중앙값을 한번의 부분정렬로 계산
+            self.cutline_percent_up, self.cutline_percent_down, self.median = get_nanpercentiles(
+                self._array, [100 - self.percent, self.percent, 50])
 
             self.set_color(color)
-            self.median = np.nanmedian(self._array)
             self.cutline_color_up = self.median + self.color_jnd/2
             self.cutline_color_down = self.median - self.color_jnd/2
 
@@ -639,21 +1128,21 @@ class TailsMura_Fixed_JND:
         Args:
             method (str): 기준선 종류["percent", "color", "both"]
         Returns:
-            mask_up (ndarray): 기준선 적용 배열(0:이하, 1:초과)
-            mask_down (ndarray): 기준선 적용 배열(0:이상, 1:미만)
+            mask_up (ndarray): 기준선 적용 배열(bool, False:이하, True:초과)
+            mask_down (ndarray): 기준선 적용 배열(bool, False:이상, True:미만)
         """
-        mask_up, mask_down = np.zeros(self.array.shape), np.zeros(self.array.shape)
+        mask_up, mask_down = np.zeros(self.array.shape, dtype=bool), np.zeros(self.array.shape, dtype=bool)
         if self.flag_array and self.flag_cutline:
             A = self.array
             if method == 'percent':
-                mask_up = np.where(A > self.cutline_percent_up, 1, 0)
-                mask_down = np.where(A < self.cutline_percent_down, 1, 0)
+                mask_up = A > self.cutline_percent_up
+                mask_down = A < self.cutline_percent_down
             elif method == 'jnd':
-                mask_up = np.where(A > self.cutline_color_up, 1, 0)
-                mask_down = np.where(A < self.cutline_color_down, 1, 0)
+                mask_up = A > self.cutline_color_up
+                mask_down = A < self.cutline_color_down
             else:  # 'both'
-                mask_up = np.where(A > self.cutline_both_up, 1, 0)
-                mask_down = np.where(A < self.cutline_both_down, 1, 0)
+                mask_up = A > self.cutline_both_up
+                mask_down = A < self.cutline_both_down
 
             # print(f"get_mask(method={method}, logic={self.cutline_logic}): "
             #     + f"sum(up,down)=({np.sum(mask_up)}, {np.sum(mask_down)})")
@@ -720,14 +1209,12 @@ class TailsMura_Fixed_JND:
         """
         mask_up, mask_down = self.get_mask(method=method)
         ratio_up, ratio_down = 0, 0
-        if np.sum(mask_up) > 1:
-            segment_up = SegmentationWithDiagonal(mask_up)
-            area_up = segment_up.areas()
-            ratio_up = np.max(area_up)/np.size(mask_up)*100
-        if np.sum(mask_down) > 1:
-            segment_down = SegmentationWithDiagonal(mask_down)
-            area_down = segment_down.areas()
-            ratio_down = np.max(area_down)/np.size(mask_down)*100
+        if np.count_nonzero(mask_up) > 1:
+            area_up = largest_component_area(mask_up, connectivity=8)
+            ratio_up = area_up/np.size(mask_up)*100
+        if np.count_nonzero(mask_down) > 1:
+            area_down = largest_component_area(mask_down, connectivity=8)
+            ratio_down = area_down/np.size(mask_down)*100
 
         ratio_avg = self.get_weighted_average_ratio(ratio_up, ratio_down)
         return ratio_avg, ratio_up, ratio_down
@@ -746,14 +1233,12 @@ class TailsMura_Fixed_JND:
         """
         mask_up, mask_down = self.get_mask(method=method)
         ratio_up, ratio_down = 0, 0
-        if np.sum(mask_up) > 1:
-            segment_up = Segmentation(mask_up)
-            area_up = segment_up.areas()
-            ratio_up = np.max(area_up)/np.size(mask_up)*100
-        if np.sum(mask_down) > 1:
-            segment_down = Segmentation(mask_down)
-            area_down = segment_down.areas()
-            ratio_down = np.max(area_down)/np.size(mask_down)*100
+        if np.count_nonzero(mask_up) > 1:
+            area_up = largest_component_area(mask_up, connectivity=4)
+            ratio_up = area_up/np.size(mask_up)*100
+        if np.count_nonzero(mask_down) > 1:
+            area_down = largest_component_area(mask_down, connectivity=4)
+            ratio_down = area_down/np.size(mask_down)*100
 
         ratio_avg = self.get_weighted_average_ratio(ratio_up, ratio_down)
         return ratio_avg, ratio_up, ratio_down
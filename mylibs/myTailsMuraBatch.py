@@ -0,0 +1,169 @@
+# myTailsMuraBatch.py
+""" 저장된 측정맵(.npy, .npz, .csv) 여러 개의 치우침 지수를 프로세스 병렬로 계산한다.
+
+    - 입력: 디렉터리(정렬된 파일 순서) 또는 목록 파일(한 줄에 경로 하나, '#' 주석)
+    - ProcessPoolExecutor.map(chunksize) 로 묶음 단위 분배, 결과는 입력 순서대로 즉시 기록
+    - 결과 CSV 에 이미 있는 파일(절대경로 기준)은 건너뛰므로 중단된 실행을 그대로 다시 실행하면
+      이어서 계산함(결과 CSV 가 입력 디렉터리 안에 있으면 입력에서 제외)
+      (error 열이 기록된 파일도 완료로 보며, 다시 계산하려면 해당 줄을 지우고 실행)
+
+    사용 예:
+        python -m mylibs.myTailsMuraBatch maps/ result.csv --kind wavelength --workers 32
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Literal
+
+from .myTailsMura import TailsMura_Thickness, TailsMura_Wavelength
+
+
+ARRAY_EXTENSIONS = (".npy", ".npz", ".csv")
+METHODS = ("percent", "jnd", "both")
+FINALS = ("sum", "max", "avg")
+COLUMNS = ["path", "median", "jnd"] + [
+    f"{method}_{name}" for method in METHODS for name in ("up", "down") + FINALS] + ["error"]
+
+
+def list_array_files(source: str) -> list[str]:
+    """ 디렉터리 또는 목록 파일에서 측정맵 경로 목록을 만든다.
+
+    Args:
+        source (str): 디렉터리(ARRAY_EXTENSIONS 파일, 이름순) 또는 목록 파일
+    Returns:
+        paths (list): 측정맵 경로(목록 파일의 상대경로는 목록 파일 위치 기준)
+    """
+    if os.path.isdir(source):
+        names = sorted(name for name in os.listdir(source) if name.lower().endswith(ARRAY_EXTENSIONS))
+        return [os.path.join(source, name) for name in names]
+    base = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                paths.append(line if os.path.isabs(line) else os.path.join(base, line))
+    return paths
+
+
+def load_array(path: str) -> np.ndarray:
+    """ 측정맵 읽기(.npy 는 memmap, .npz 는 첫 배열, .csv 는 쉼표 구분)
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        return np.load(path, mmap_mode="r")
+    if extension == ".npz":
+        with np.load(path) as data:
+            return data[data.files[0]]
+    return np.loadtxt(path, delimiter=",", ndmin=2)
+
+
+def score_file(path: str, kind: Literal["wavelength", "thickness"]="wavelength",
+               percent: float=25, jnd: float=-1, tile: tuple[int,int]=(2,2)) -> dict:
+    """ 측정맵 하나의 method x final 치우침 지수(작업 프로세스에서 실행)
+    - 읽기/계산 오류는 예외 대신 error 열에 기록해서 전체 실행이 멈추지 않게 함
+    """
+    row = dict.fromkeys(COLUMNS, "")
+    row["path"] = path
+    try:
+        tails = TailsMura_Thickness() if kind == "thickness" else TailsMura_Wavelength()
+        tails.set_array(load_array(path), tile)
+        tails.set_cutlines(percent, jnd)
+        row["median"], row["jnd"] = tails.median, tails.jnd
+        for (method, final), (ratio, ratio_up, ratio_down) in tails.get_tailsmura_indices().items():
+            row[f"{method}_{final}"] = ratio
+            row[f"{method}_up"], row[f"{method}_down"] = ratio_up, ratio_down
+    except Exception as error:  # noqa: BLE001 - 파일별 오류 기록
+        row["error"] = f"{type(error).__name__}: {error}"
+    return row
+
+
+def _score_task(task: tuple) -> dict:
+    return score_file(*task)
+
+
+def _completed_paths(output: str) -> set[str]:
+    """ 결과 CSV 에 기록된 경로(절대경로), 비정상 종료로 잘린 마지막 줄은 지운다.
+    """
+    if not os.path.exists(output):
+        return set()
+    with open(output, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    with open(output, newline="", encoding="utf-8") as f:
+        return {os.path.abspath(row["path"]) for row in csv.DictReader(f)}
+
+
+def run_batch(source: str|list[str], output: str,
+              kind: Literal["wavelength", "thickness"]="wavelength",
+              percent: float=25, jnd: float=-1, tile: tuple[int,int]=(2,2),
+              workers: int|None=None, chunksize: int=4, resume: bool=True) -> int:
+    """ 측정맵 목록의 치우침 지수를 병렬로 계산해서 CSV 로 기록한다.
+
+    Args:
+        source (str|list): 디렉터리, 목록 파일 또는 경로 목록
+        output (str): 결과 CSV 경로(COLUMNS 순서, 입력 순서대로 한 줄씩 기록)
+        kind (str): 측정 종류["wavelength", "thickness"]
+        percent (float): 퍼센트(default=25)
+        jnd (float): 인지 임계값 지정(-1: 임계값함수 사용)
+        tile (tuple): 이미지 타일링(rows x cols), default=(2,2)
+        workers (int): 작업 프로세스 수(생략시 CPU 수)
+        chunksize (int): 한번에 작업자에게 보내는 파일 수
+        resume (bool): True 이면 결과 CSV 에 이미 있는 파일은 건너뜀, False 이면 새로 기록
+    Returns:
+        count (int): 이번 실행에서 새로 기록한 파일 수
+    """
+    paths = list_array_files(source) if isinstance(source, str) else list(source)
+    # 결과 CSV 를 입력 디렉터리에 쓰는 경우 결과 파일 자신은 입력에서 제외
+    paths = [path for path in paths if os.path.abspath(path) != os.path.abspath(output)]
+    if not resume and os.path.exists(output):
+        os.remove(output)
+    done = _completed_paths(output)
+    tasks = [(path, kind, percent, jnd, tuple(tile)) for path in paths if os.path.abspath(path) not in done]
+    if not tasks:
+        return 0
+
+    new_file = not os.path.exists(output) or os.path.getsize(output) == 0
+    count = 0
+    with open(output, "a", newline="", encoding="utf-8") as f, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        if new_file:
+            writer.writeheader()
+        # map 은 입력 순서대로 결과를 돌려주므로 순서가 고정되고, 받은 즉시 기록함
+        for row in executor.map(_score_task, tasks, chunksize=max(1, chunksize)):
+            writer.writerow(row)
+            f.flush()
+            count += 1
+    return count
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="측정맵 디렉터리 또는 목록 파일")
+    parser.add_argument("output", help="결과 CSV")
+    parser.add_argument("--kind", choices=("wavelength", "thickness"), default="wavelength")
+    parser.add_argument("--percent", type=float, default=25)
+    parser.add_argument("--jnd", type=float, default=-1)
+    parser.add_argument("--tile", type=int, nargs=2, default=(2, 2))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=4)
+    parser.add_argument("--no-resume", action="store_true", help="기존 결과를 지우고 처음부터 계산")
+    args = parser.parse_args(argv)
+
+    count = run_batch(args.source, args.output, args.kind, args.percent, args.jnd, tuple(args.tile),
+                      args.workers, args.chunksize, resume=not args.no_resume)
+    print(f"{count} files written: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())